@@ -1,12 +1,14 @@
 from flask import Flask, render_template, request, redirect, url_for, session, g, flash
-import sqlite3, os, json, datetime
-from functools import wraps
+import sqlite3, os, json, datetime, queue, csv, io, math
+from functools import wraps, lru_cache
+from contextlib import contextmanager
 from werkzeug.security import generate_password_hash, check_password_hash
-from urllib.parse import urlparse
+from jinja2.utils import htmlsafe_json_dumps
 
 app = Flask(__name__, static_folder='static')
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-change-me")
 DB = os.getenv("DATABASE_URL", "finance.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
 
 # ------------------ Currencies (USD → local demo rates) ------------------
 CURRENCY_RATES = {
@@ -23,10 +25,6 @@ def to_usd(amount_local: float, currency: str) -> float:
     rate = CURRENCY_RATES.get(currency, 1.0)
     return amount_local / rate
 
-def from_usd(amount_usd: float, currency: str) -> float:
-    rate = CURRENCY_RATES.get(currency, 1.0)
-    return amount_usd * rate
-
 # ------------------ Categories ------------------
 CATEGORIES = [
     ("Salary","income"), ("Freelance","income"), ("Dividends","income"),
@@ -35,51 +33,129 @@ CATEGORIES = [
     ("Entertainment","expense"), ("Healthcare","expense"),
 ]
 CATEGORY_MAP = {n:t for n,t in CATEGORIES}
+CATEGORY_NAMES = [n for n,_ in CATEGORIES]
+CATEGORY_BY_LOWER = {n.lower(): n for n in CATEGORY_NAMES}
+EXPENSE_SET = frozenset(n for n,t in CATEGORY_MAP.items() if t == "expense")
 
 # ------------------ DB helpers ------------------
-def get_conn():
-    conn = sqlite3.connect(DB)
+def _configure(conn):
+    # Per-connection settings; run once when the connection is created.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA cache_size=-65536")
+
+def _connect():
+    # Autocommit: sqlite3 never opens implicit transactions; multi-statement
+    # writes use explicit BEGIN (see transactional()).
+    conn = sqlite3.connect(DB, check_same_thread=False, cached_statements=256,
+                           isolation_level=None)
     conn.row_factory = sqlite3.Row
+    _configure(conn)
     return conn
 
+# Small pool of pre-opened connections shared by all requests
+_pool = queue.Queue(maxsize=DB_POOL_SIZE)
+for _ in range(DB_POOL_SIZE):
+    _pool.put(_connect())
+
+def get_conn():
+    """Connection for the current app context, borrowed from the pool."""
+    if "db" not in g:
+        try:
+            g.db = _pool.get_nowait()
+        except queue.Empty:
+            g.db = _connect()
+    return g.db
+
+@app.teardown_appcontext
+def close_conn(exc):
+    conn = g.pop("db", None)
+    if conn is None:
+        return
+    if conn.in_transaction:
+        conn.rollback()
+    try:
+        _pool.put_nowait(conn)
+    except queue.Full:
+        conn.close()
+
 def _cols(conn, table):
     return [r["name"] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
 
+# Bump when the schema below changes; stored in PRAGMA user_version
+SCHEMA_VERSION = 4
+
+USERS_COLUMNS = """(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  username TEXT UNIQUE NOT NULL,
+  password_hash TEXT,
+  created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+  currency TEXT DEFAULT 'USD'
+)"""
+
+SCHEMA = f"""
+-- users (with currency pref)
+CREATE TABLE IF NOT EXISTS users{USERS_COLUMNS};
+-- transactions (user-scoped, amounts stored in USD)
+CREATE TABLE IF NOT EXISTS transactions(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  date TEXT,
+  description TEXT,
+  category TEXT,
+  amount REAL,
+  user_id INTEGER
+);
+-- investments (user-scoped, price stored in USD)
+CREATE TABLE IF NOT EXISTS investments(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  date TEXT,
+  ticker TEXT,
+  shares REAL,
+  price REAL,
+  user_id INTEGER
+);
+"""
+
+INDEXES = """
+-- MAX(id) per user (the dashboard cache probe) is a single index seek
+CREATE INDEX IF NOT EXISTS ix_tx_user_id ON transactions(user_id, id);
+DROP INDEX IF EXISTS ix_tx_user_date;
+-- covers SQL_TX_AGGREGATES, so the dashboard aggregation never touches the table
+CREATE INDEX IF NOT EXISTS ix_tx_agg ON transactions(user_id, category, date, amount);
+DROP INDEX IF EXISTS ix_tx_user_cat;
+CREATE INDEX IF NOT EXISTS ix_inv_user_date ON investments(user_id, date);
+"""
+
+def _run_script(conn, script):
+    # executescript() would COMMIT first; run statements one by one to stay in the caller's transaction
+    for stmt in script.split(";"):
+        if stmt.strip():
+            conn.execute(stmt)
+
+def _rebuild_legacy_users(conn):
+    # The old quick_init.py created users(pw_hash BLOB NOT NULL), which makes every
+    # signup INSERT fail. Its bcrypt hashes can't be checked by the app, so only the
+    # account rows are carried over into the canonical table.
+    conn.execute(f"CREATE TABLE users_new{USERS_COLUMNS}")
+    conn.execute("""
+      INSERT INTO users_new(id, username, password_hash, created_at, currency)
+      SELECT id, username, password_hash, created_at, currency FROM users
+    """)
+    conn.execute("DROP TABLE users")
+    conn.execute("ALTER TABLE users_new RENAME TO users")
+
 def init_db():
-    with get_conn() as conn:
-        c = conn.cursor()
-        # users (with currency pref)
-        c.execute("""
-          CREATE TABLE IF NOT EXISTS users(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE NOT NULL,
-            password_hash TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-            currency TEXT DEFAULT 'USD'
-          )
-        """)
-        # transactions (user-scoped, amounts stored in USD)
-        c.execute("""
-          CREATE TABLE IF NOT EXISTS transactions(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT,
-            description TEXT,
-            category TEXT,
-            amount REAL,
-            user_id INTEGER
-          )
-        """)
-        # investments (user-scoped, price stored in USD)
-        c.execute("""
-          CREATE TABLE IF NOT EXISTS investments(
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            date TEXT,
-            ticker TEXT,
-            shares REAL,
-            price REAL,
-            user_id INTEGER
-          )
-        """)
+    conn = get_conn()
+    # Already migrated -> a single PRAGMA read and nothing else
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+        return
+    # One transaction: a failed migration leaves the DB as it was, unstamped
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _run_script(conn, SCHEMA)
         # ---- Auto-migrate old DBs ----
         for table in ("users","transactions","investments"):
             cols = _cols(conn, table)
@@ -87,29 +163,80 @@ def init_db():
                 if "password_hash" not in cols:
                     conn.execute("ALTER TABLE users ADD COLUMN password_hash TEXT")
                 if "created_at" not in cols:
-                    conn.execute("ALTER TABLE users ADD COLUMN created_at TEXT DEFAULT CURRENT_TIMESTAMP")
+                    # ADD COLUMN can't take a non-constant default; backfill instead
+                    conn.execute("ALTER TABLE users ADD COLUMN created_at TEXT")
+                    conn.execute("UPDATE users SET created_at=CURRENT_TIMESTAMP WHERE created_at IS NULL")
                 if "currency" not in cols:
                     conn.execute("ALTER TABLE users ADD COLUMN currency TEXT DEFAULT 'USD'")
+                if "pw_hash" in cols:
+                    _rebuild_legacy_users(conn)
             if table in ("transactions","investments"):
                 if "user_id" not in cols:
                     conn.execute(f"ALTER TABLE {table} ADD COLUMN user_id INTEGER")
-        conn.commit()
+        _run_script(conn, INDEXES)
+        conn.execute("ANALYZE")
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
 
 with app.app_context():
     init_db()
 
+# ------------------ SQL ------------------
+# Kept as module constants so each connection's statement cache reuses the prepared plan
+SQL_USER_BY_ID = "SELECT * FROM users WHERE id=?"
+SQL_USER_BY_NAME = "SELECT * FROM users WHERE username=?"
+SQL_USER_INSERT = "INSERT INTO users(username, password_hash) VALUES (?,?)"
+SQL_USER_SET_CURRENCY = "UPDATE users SET currency=? WHERE id=?"
+SQL_TX_INSERT = "INSERT INTO transactions(date,description,category,amount,user_id) VALUES (?,?,?,?,?)"
+SQL_TX_AGGREGATES = """
+    SELECT CAST(substr(date, 6, 2) AS INTEGER) AS m, category,
+           SUM(CASE WHEN amount >= 0 THEN amount END),
+           SUM(CASE WHEN amount < 0 THEN -amount END),
+           SUM(CASE WHEN date >= ?1 AND amount >= 0 THEN amount END),
+           SUM(CASE WHEN date >= ?1 AND amount < 0 THEN -amount END),
+           SUM(amount), MIN(date)
+    FROM transactions WHERE user_id=?2 GROUP BY m, category
+"""
+SQL_INV_INSERT = "INSERT INTO investments(date,ticker,shares,price,user_id) VALUES (?,?,?,?,?)"
+SQL_ASSET_VALUES = """
+    SELECT ticker, SUM(shares*price) FROM investments
+    WHERE user_id=? GROUP BY ticker ORDER BY MIN(date), MIN(id)
+"""
+SQL_INV_BY_DATE_DESC = "SELECT *, shares*price AS value FROM investments WHERE user_id=? ORDER BY date DESC, id DESC"
+SQL_MAX_IDS = """
+    SELECT (SELECT MAX(id) FROM transactions WHERE user_id=?1),
+           (SELECT MAX(id) FROM investments WHERE user_id=?1)
+"""
+
 # ------------------ Auth utils ------------------
+# One hasher for the app and quick_init.py, with its cost pinned explicitly
+# (scrypt N=2**15, r=8, p=1) so upgrading Werkzeug doesn't silently change it.
+# Existing hashes keep verifying: check_password_hash reads the stored method.
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+
+def hash_password(password: str) -> str:
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+# Checked against when the username is unknown so every login costs one hash
+_DUMMY_HASH = hash_password(os.urandom(16).hex())
+
 def load_logged_in_user():
     uid = session.get("user_id")
     if not uid:
         g.user = None
     else:
-        with get_conn() as conn:
-            g.user = conn.execute("SELECT * FROM users WHERE id=?", (uid,)).fetchone()
+        g.user = get_conn().execute(SQL_USER_BY_ID, (uid,)).fetchone()
 
 @app.before_request
 def _before():
     load_logged_in_user()
+    # resolved once per request; the money filter runs for every displayed amount
+    g.currency = (g.user["currency"] or "USD") if g.user else "USD"
+    g.sym = CURRENCY_SYMBOLS.get(g.currency, "")
+    g.rate = CURRENCY_RATES.get(g.currency, 1.0)
 
 def login_required(view):
     @wraps(view)
@@ -119,36 +246,112 @@ def login_required(view):
         return view(*args, **kwargs)
     return wrapped
 
+@contextmanager
+def write_transaction():
+    """BEGIN IMMEDIATE ... COMMIT on the request's connection; rolls back on error."""
+    conn = get_conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except Exception:
+        conn.rollback()
+        raise
+    conn.commit()
+
+def transactional(view):
+    """Run a POST view inside write_transaction().
+
+    The write lock is held for the whole view, so only use it on views whose
+    work before the write is cheap; hash or parse first otherwise.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if request.method != "POST":
+            return view(*args, **kwargs)
+        with write_transaction():
+            return view(*args, **kwargs)
+    return wrapped
+
 # ------------------ Template filters ------------------
 @app.template_filter('money')
 def money_filter(amount_usd):
-    # sqlite3.Row supports dict-style indexing but not .get()
-    cur = "USD"
-    if getattr(g, "user", None) is not None:
-        try:
-            user_cur = g.user["currency"]
-            if user_cur:
-                cur = user_cur
-        except Exception:
-            pass
-    sym = CURRENCY_SYMBOLS.get(cur, "")
-    val_local = from_usd(float(amount_usd or 0.0), cur)
-    return f"{sym}{val_local:,.2f}"
+    return f"{g.sym}{float(amount_usd or 0.0) * g.rate:,.2f}"
+
+# ------------------ Aggregates ------------------
+def per_request_cache(fn):
+    """Memoize fn(*args) on g for the lifetime of the current request."""
+    @wraps(fn)
+    def wrapped(*args):
+        cache = g.setdefault("_cache", {})
+        key = (fn.__name__,) + args
+        if key not in cache:
+            cache[key] = fn(*args)
+        return cache[key]
+    return wrapped
+
+def ninety_days_ago(today=None):
+    today = today or datetime.date.today()
+    return (today - datetime.timedelta(days=90)).isoformat()
+
+@per_request_cache
+def get_asset_values(uid):
+    """{ticker: USD value}, in order of first purchase."""
+    cur = get_conn().cursor()
+    cur.row_factory = None
+    return dict(cur.execute(SQL_ASSET_VALUES, (uid,)))
+
+@per_request_cache
+def get_transaction_aggregates(uid, since):
+    """Monthly, per-category and since-date totals from one scan of the user's rows."""
+    month_inc, month_exp = [0]*12, [0]*12
+    cat_totals, cat_first = {}, {}
+    inc_since = exp_since = 0
+    cur = get_conn().cursor()
+    cur.row_factory = None  # plain tuples; rows are unpacked positionally
+    rows = cur.execute(SQL_TX_AGGREGATES, (since, uid))
+    for m, cat, inc, exp, inc90, exp90, total, first in rows:
+        if m and 1 <= m <= 12:
+            month_inc[m-1] += inc or 0
+            month_exp[m-1] += exp or 0
+        inc_since += inc90 or 0
+        exp_since += exp90 or 0
+        cat_totals[cat] = cat_totals.get(cat, 0) + total
+        if cat not in cat_first or (first or "") < cat_first[cat]:
+            cat_first[cat] = first or ""
+    # categories in order of first appearance
+    cat_totals = {k: cat_totals[k] for k in sorted(cat_totals, key=cat_first.get)}
+    return {
+        "month_income": month_inc,
+        "month_expense": month_exp,
+        "category_totals": cat_totals,
+        "income_since": inc_since,
+        "expense_since": exp_since,
+    }
+
+@lru_cache(maxsize=256)
+def _chart_json(uid, tx_max_id, inv_max_id):
+    """All dashboard chart data as one JSON blob; rows are append-only, so new max ids mean new data."""
+    assets = get_asset_values(uid)
+    agg = get_transaction_aggregates(uid, ninety_days_ago())
+    spends = [(k, -v) for k, v in agg["category_totals"].items() if v < 0]
+    exp_labels, exp_values = zip(*spends) if spends else ((), ())
+    # HTML-safe so it can be embedded directly in the page's <script> block
+    return htmlsafe_json_dumps({
+        "asset_labels": list(assets),
+        "asset_values": list(assets.values()),
+        "income": agg["month_income"],
+        "expense": agg["month_expense"],
+        "exp_labels": exp_labels,
+        "exp_values": exp_values,
+    })
 
 # ------------------ Insights ------------------
-def summarize(txns, invests):
-    balance = sum(t['amount'] for t in txns)
-    cat_totals, month_inc, month_exp = {}, [0]*12, [0]*12
-    today = datetime.date.today()
-    last_90 = [t for t in txns if (today - datetime.datetime.strptime(t['date'], "%Y-%m-%d").date()).days <= 90]
-
-    for t in txns:
-        amt = t['amount']
-        d = datetime.datetime.strptime(t['date'], "%Y-%m-%d")
-        m = d.month - 1
-        if amt >= 0: month_inc[m] += amt
-        else:        month_exp[m] += -amt
-        cat_totals[t['category']] = cat_totals.get(t['category'], 0) + amt
+def summarize(uid, assets, today=None):
+    agg = get_transaction_aggregates(uid, ninety_days_ago(today))
+    month_inc, month_exp = agg["month_income"], agg["month_expense"]
+    cat_totals = agg["category_totals"]
+    balance = sum(cat_totals.values())
+    inc90, exp90 = agg["income_since"], agg["expense_since"]
 
     msgs = []
     # savings streak
@@ -182,7 +385,7 @@ def summarize(txns, invests):
             msgs.append("📈 Consider diversifying income sources.")
 
     # portfolio diversification
-    vals = [i['shares']*i['price'] for i in invests]
+    vals = list(assets.values())
     total_assets = sum(vals)
     if total_assets > 0:
         shares = [(v/total_assets) for v in vals]
@@ -193,8 +396,6 @@ def summarize(txns, invests):
             msgs.append("📌 Portfolio concentration is high; consider more variety.")
 
     # savings rate last 90 days
-    inc90 = sum(t['amount'] for t in last_90 if t['amount'] >= 0)
-    exp90 = -sum(t['amount'] for t in last_90 if t['amount'] < 0)
     if inc90:
         rate = (inc90 - exp90) / inc90
         if rate < 0: msgs.append("❗ You spent more than you earned in the last 3 months.")
@@ -205,12 +406,29 @@ def summarize(txns, invests):
 
     return {
         "balance": balance,
+        "total_assets": total_assets,
         "category_totals": cat_totals,
         "month_income": month_inc,
         "month_expense": month_exp,
         "insights": msgs
     }
 
+@lru_cache(maxsize=512)
+def _summary_cached(uid, tx_max_id, inv_max_id, today):
+    """summarize() memoized on the user's max row ids (append-only) and the date."""
+    return summarize(uid, get_asset_values(uid), today)
+
+# Dashboard for a user with no rows yet; served without running any aggregate query
+EMPTY_SUMMARY = {
+    "balance": 0, "total_assets": 0, "category_totals": {},
+    "month_income": [0]*12, "month_expense": [0]*12,
+    "insights": ["Add your first transaction to see insights!"],
+}
+EMPTY_CHART_DATA = htmlsafe_json_dumps({
+    "asset_labels": [], "asset_values": [], "income": [0]*12, "expense": [0]*12,
+    "exp_labels": [], "exp_values": [],
+})
+
 # ------------------ Auth routes ------------------
 @app.route("/signup", methods=["GET","POST"])
 def signup():
@@ -220,12 +438,9 @@ def signup():
         if not username or not password:
             flash("Username and password are required.")
             return render_template("signup.html")
-        pw_hash = generate_password_hash(password)
+        pw_hash = hash_password(password)  # slow by design; done outside any write lock
         try:
-            with get_conn() as conn:
-                conn.execute("INSERT INTO users(username, password_hash) VALUES (?,?)",
-                             (username, pw_hash))
-                conn.commit()
+            get_conn().execute(SQL_USER_INSERT, (username, pw_hash))  # single statement, autocommits
             flash("Account created! Please sign in.")
             return redirect(url_for("login"))
         except sqlite3.IntegrityError:
@@ -237,12 +452,16 @@ def login():
     if request.method == "POST":
         username = request.form.get("username","").strip()
         password = request.form.get("password","")
-        with get_conn() as conn:
-            user = conn.execute("SELECT * FROM users WHERE username=?", (username,)).fetchone()
-        if user and check_password_hash(user["password_hash"], password):
+        user = get_conn().execute(SQL_USER_BY_NAME, (username,)).fetchone()
+        pw_hash = (user["password_hash"] if user else None) or _DUMMY_HASH
+        if check_password_hash(pw_hash, password) and user:
             session.clear(); session["user_id"] = user["id"]
             nxt = request.args.get("next", "/")
-            if not nxt or urlparse(nxt).netloc: nxt = url_for("dashboard")
+            # only same-site paths; '//host' and '/\host' are protocol-relative in browsers,
+            # which also drop tab/CR/LF, so '/\t/host' would become '//host'
+            if (not nxt.startswith("/") or nxt.startswith(("//", "/\\"))
+                    or any(c in nxt for c in "\t\r\n")):
+                nxt = url_for("dashboard")
             return redirect(nxt)
         flash("Invalid username or password.")
     return render_template("login.html")
@@ -255,92 +474,142 @@ def logout():
 # ------------------ Settings (currency) ------------------
 @app.route("/settings", methods=["GET","POST"])
 @login_required
+@transactional
 def settings():
     if request.method == "POST":
         currency = request.form.get("currency","USD")
         if currency not in CURRENCY_CHOICES:
             flash("Invalid currency.")
         else:
-            with get_conn() as conn:
-                conn.execute("UPDATE users SET currency=? WHERE id=?", (currency, g.user["id"]))
-                conn.commit()
+            get_conn().execute(SQL_USER_SET_CURRENCY, (currency, g.user["id"]))
             flash("Settings updated.")
             return redirect(url_for("settings"))
     return render_template("settings.html", currencies=CURRENCY_CHOICES,
-                           current=(g.user["currency"] or "USD"))
+                           current=g.currency)
 
 # ------------------ App routes (user-scoped) ------------------
 @app.route("/")
 @login_required
 def dashboard():
     uid = g.user["id"]
-    with get_conn() as conn:
-        txns = conn.execute("SELECT * FROM transactions WHERE user_id=? ORDER BY date", (uid,)).fetchall()
-        invests = conn.execute("SELECT * FROM investments WHERE user_id=? ORDER BY date", (uid,)).fetchall()
-
-    summary = summarize(txns, invests)
-    asset_labels = [i['ticker'] for i in invests]
-    asset_values = [i['shares']*i['price'] for i in invests]
-    net_worth = summary['balance'] + sum(asset_values)
+    conn = get_conn()
+    # one read transaction so all selects share a single snapshot/lock
+    conn.execute("BEGIN")
+    try:
+        cur = conn.cursor()
+        cur.row_factory = None
+        tx_max_id, inv_max_id = cur.execute(SQL_MAX_IDS, (uid,)).fetchone()
+        if tx_max_id is None and inv_max_id is None:
+            summary, chart_data = EMPTY_SUMMARY, EMPTY_CHART_DATA
+        else:
+            summary = _summary_cached(uid, tx_max_id, inv_max_id, datetime.date.today())
+            chart_data = _chart_json(uid, tx_max_id, inv_max_id)
+    finally:
+        conn.commit()
 
-    exp_labels = [k for k, v in summary['category_totals'].items() if v < 0]
-    exp_values = [abs(v) for v in summary['category_totals'].values() if v < 0]
+    net_worth = summary['balance'] + summary['total_assets']
 
     return render_template(
         "index.html",
-        txns=txns, invests=invests, summary=summary, net_worth=net_worth,
-        asset_labels=json.dumps(asset_labels), asset_values=json.dumps(asset_values),
-        income=json.dumps(summary['month_income']), expense=json.dumps(summary['month_expense']),
-        categories=[name for name,_ in CATEGORIES],
-        exp_labels=json.dumps(exp_labels), exp_values=json.dumps(exp_values)
+        summary=summary, net_worth=net_worth,
+        categories=CATEGORY_NAMES, chart_data=chart_data
     )
 
 @app.route("/add", methods=["GET","POST"])
 @login_required
+@transactional
 def add():
     if request.method == "POST":
         uid = g.user["id"]
-        cur = (g.user["currency"] or "USD") if g.user else "USD"
+        cur = g.currency
         date = request.form["date"]
         description = request.form["description"]
         category = request.form["category"]
         amount_local = float(request.form["amount"])
         amount_usd = to_usd(amount_local, cur)
-        amt = amount_usd if CATEGORY_MAP.get(category,"income")=="income" else -amount_usd
-        with get_conn() as conn:
-            conn.execute(
-                "INSERT INTO transactions(date,description,category,amount,user_id) VALUES (?,?,?,?,?)",
-                (date, description, category, amt, uid)
-            ); conn.commit()
+        amt = -amount_usd if category in EXPENSE_SET else amount_usd
+        get_conn().execute(SQL_TX_INSERT, (date, description, category, amt, uid))
         return redirect(url_for("dashboard"))
     return render_template("add.html",
-                           categories=[name for name,_ in CATEGORIES],
-                           currency=((g.user["currency"] or "USD") if g.user else "USD"))
+                           categories=CATEGORY_NAMES,
+                           currency=g.currency)
+
+# ----------- CSV import (bulk add) -----------
+def parse_import_csv(data, currency, uid):
+    """Validated insert tuples for SQL_TX_INSERT; raises ValueError naming the bad line."""
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("The file is not UTF-8 text.") from None
+    rows = []
+    try:
+        for n, row in enumerate(csv.reader(io.StringIO(text)), 1):
+            if not row or (n == 1 and row[0].strip().lower() == "date"):
+                continue
+            try:
+                date, description, category, amount = (v.strip() for v in row[:4])
+                # stored as ISO text: the monthly and 90-day aggregates rely on it
+                date = datetime.date.fromisoformat(date).isoformat()
+                amount = float(amount)  # signed like /add: a negative amount reverses the entry
+            except ValueError:
+                raise ValueError(f"Line {n}: expected date (YYYY-MM-DD), description, category, amount.") from None
+            if not math.isfinite(amount):
+                raise ValueError(f"Line {n}: amount must be a finite number.")
+            category = CATEGORY_BY_LOWER.get(category.lower())
+            if category is None:
+                raise ValueError(f"Line {n}: unknown category; use one of {', '.join(CATEGORY_NAMES)}.")
+            amount_usd = to_usd(amount, currency)
+            amt = -amount_usd if category in EXPENSE_SET else amount_usd
+            rows.append((date, description, category, amt, uid))
+    except csv.Error as e:
+        raise ValueError(f"Could not read the CSV file: {e}") from None
+    return rows
+
+@app.route("/import", methods=["GET","POST"])
+@login_required
+def import_csv():
+    cur = g.currency
+    if request.method == "POST":
+        uid = g.user["id"]
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Choose a CSV file to import.")
+            return render_template("import.html", currency=cur)
+        try:
+            rows = parse_import_csv(upload.read(), cur, uid)
+        except ValueError as e:
+            flash(str(e))
+            return render_template("import.html", currency=cur)
+        if not rows:
+            flash("No transactions found in the file.")
+            return render_template("import.html", currency=cur)
+        # parsed above, so the write lock only covers the batch insert -> a single commit
+        with write_transaction() as conn:
+            conn.executemany(SQL_TX_INSERT, rows)
+        flash(f"Imported {len(rows)} transactions.")
+        return redirect(url_for("dashboard"))
+    return render_template("import.html", currency=cur)
 
 # ----------- Assets page (list + add) -----------
 @app.route("/assets", methods=["GET","POST"])
 @login_required
+@transactional
 def assets():
     uid = g.user["id"]
-    cur = (g.user["currency"] or "USD") if g.user else "USD"
+    cur = g.currency
     if request.method == "POST":
         date = request.form["date"]
         ticker = request.form["ticker"].strip()
         shares = float(request.form["shares"])
         price_local = float(request.form["price"])
         price_usd = to_usd(price_local, cur)
-        with get_conn() as conn:
-            conn.execute(
-                "INSERT INTO investments(date,ticker,shares,price,user_id) VALUES (?,?,?,?,?)",
-                (date, ticker, shares, price_usd, uid)
-            ); conn.commit()
+        get_conn().execute(SQL_INV_INSERT, (date, ticker, shares, price_usd, uid))
         return redirect(url_for("assets"))
 
-    with get_conn() as conn:
-        rows = conn.execute("SELECT * FROM investments WHERE user_id=? ORDER BY date DESC", (uid,)).fetchall()
+    rows = get_conn().execute(SQL_INV_BY_DATE_DESC, (uid,)).fetchall()
 
     labels = [r["ticker"] for r in rows]
-    values_usd = [r["shares"]*r["price"] for r in rows]
+    values_usd = [r["value"] for r in rows]
     total_usd = sum(values_usd)
 
     return render_template(
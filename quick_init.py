@@ -1,33 +1,23 @@
 """
-Run once to create the users table and an admin account.
+Run once to create an admin account.
 
     python quick_init.py
 """
 
-import sqlite3, getpass, bcrypt, os, sys
-
-DB = "finance.db"
-if not os.path.exists(DB):
-    sys.exit("❌  finance.db not found – run app.py once first.")
-
-con = sqlite3.connect(DB)
-cur = con.cursor()
-
-cur.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT UNIQUE NOT NULL,
-    pw_hash  BLOB NOT NULL
-);
-""")
-
-cur.execute("PRAGMA table_info(transactions);")
-if "user_id" not in [c[1] for c in cur.fetchall()]:
-    cur.execute("ALTER TABLE transactions ADD COLUMN user_id INTEGER DEFAULT 1;")
+import getpass
+from app import app, get_conn, hash_password, SQL_USER_INSERT  # importing app creates/migrates the schema
 
 username = input("Admin username: ").strip()
-password = getpass.getpass("Password: ").encode()
-cur.execute("INSERT OR IGNORE INTO users (username, pw_hash) VALUES (?,?)",
-            (username, bcrypt.hashpw(password, bcrypt.gensalt())))
-con.commit()
+password = getpass.getpass("Password: ")
+
+with app.app_context():
+    conn = get_conn()
+    conn.execute("BEGIN IMMEDIATE")
+    if conn.execute("SELECT 1 FROM users WHERE username=?", (username,)).fetchone():
+        raise SystemExit("❌  That username already exists.")
+    uid = conn.execute(SQL_USER_INSERT, (username, hash_password(password))).lastrowid
+    # rows from before accounts existed belong to the admin
+    conn.execute("UPDATE transactions SET user_id=? WHERE user_id IS NULL", (uid,))
+    conn.execute("UPDATE investments SET user_id=? WHERE user_id IS NULL", (uid,))
+    conn.commit()
 print("✅  Admin user created.")